@@ -0,0 +1,48 @@
+"""
+Compare import time of a materialized environment with the import time through `TipMetaFinder`.
+
+Usage: python benchmarks/import_modes.py <environment_name> <module> [<module> ...] [--repeat N]
+
+The environment must be installed and materialized with `tip materialize <environment_name>`.
+"""
+import os
+import sys
+import shutil
+import argparse
+import statistics
+import subprocess
+
+
+TIP_DIR = os.path.expanduser(os.getenv('TIP_DIR', os.path.join('~', '.tip')))
+
+
+def measure(command: list[str], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output(command, text=True)
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('environment_name')
+    parser.add_argument('modules', nargs='+')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    tip = shutil.which('tip') or os.path.join(TIP_DIR, 'bin', 'tip')
+    environment_path = os.path.join(TIP_DIR, 'environments', f'{args.environment_name}.json')
+    imports = '; '.join(f'import {module}' for module in args.modules)
+    script = f"import time; t = time.perf_counter(); {imports}; print(time.perf_counter() - t)"
+    modes = {
+        'finder': [sys.executable, tip, 'run', '-e', environment_path, '--no-view', '-c', script],
+        'view': [sys.executable, tip, 'run', '-e', environment_path, '-c', script],
+    }
+    for mode, command in modes.items():
+        timings = measure(command, args.repeat)
+        print(f"{mode:>6}: median {statistics.median(timings) * 1000:.1f} ms, "
+              f"min {min(timings) * 1000:.1f} ms over {args.repeat} runs")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,7 @@
 from . import shell
+
+
+def activate(env):
+    """Make packages of environment `env` importable until the context exits, see `tip.activation.activate`."""
+    from .activation import activate as activate_
+    return activate_(env)
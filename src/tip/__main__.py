@@ -1,5 +1,9 @@
-from .cli import app
+import os
+import sys
 
 
 if __name__ == "__main__":
-    app()
+    # `python -m tip` isn't started by a script in `TIP_DIR/bin`, so TIP_DIR is located the same way setup.py does it
+    sys.argv[0] = os.path.join(os.path.expanduser(os.getenv('TIP_DIR', os.path.join('~', '.tip'))), 'bin', 'tip')
+    from .client import main
+    main()
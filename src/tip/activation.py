@@ -0,0 +1,98 @@
+import os
+import sys
+import importlib
+import contextlib
+from importlib.machinery import EXTENSION_SUFFIXES, ExtensionFileLoader
+
+from tip import cache, runner
+from tip.environment import Environment
+from tip.tip_meta_finder import TipMetaFinder
+
+
+# Extension modules can't be unloaded: top-level package name -> package dir they were loaded from.
+_loaded_extensions: dict[str, str] = {}
+
+
+@contextlib.contextmanager
+def activate(env: Environment | str):
+    """
+    Make packages of environment `env` (or environment named `env`) importable until the context exits.
+
+    On exit modules imported from the environment packages within the context are unloaded and `sys.meta_path` is
+    restored, so many environments can be used one after another in a single interpreter. Other modules, e.g. the
+    standard library, stay loaded. Packages with extension modules stay loaded as a whole, because extension modules
+    can't be initialized twice, therefore activation raises `RuntimeError` if the environment needs another version of
+    such a package. It also raises if a package of the environment was already imported outside of the environment.
+
+    Examples
+    --------
+    >>> with tip.activate('base'):
+    ...     import requests
+    """
+    if isinstance(env, str):
+        env = Environment.load(name=env)
+    packages_to_folders = runner._map_packages_to_folders(env)
+    _check_can_activate(packages_to_folders)
+    saved_modules = dict(sys.modules)
+    saved_meta_path = list(sys.meta_path)
+    finder = TipMetaFinder(packages_to_folders)
+    sys.meta_path.insert(0, finder)
+    try:
+        yield finder
+    finally:
+        sys.meta_path[:] = saved_meta_path
+        _unload_environment_modules(saved_modules, packages_to_folders)
+        importlib.invalidate_caches()
+
+
+def _unload_environment_modules(saved_modules: dict, packages_to_folders: dict[str, str]):
+    """Unload modules imported from `packages_to_folders` after `saved_modules`, except packages with extensions."""
+    modules_by_package_dir: dict[str, dict] = {}
+    for name, module in list(sys.modules.items()):
+        if saved_modules.get(name) is module:
+            continue
+        package_dir = packages_to_folders.get(name.partition('.')[0])
+        if package_dir is not None and _is_loaded_from_package(module, package_dir):
+            modules_by_package_dir.setdefault(package_dir, {})[name] = module
+    for package_dir, modules in modules_by_package_dir.items():
+        if any(_is_extension(module) for module in modules.values()):
+            for name in modules:
+                _loaded_extensions[name.partition('.')[0]] = package_dir
+            continue
+        for name in modules:
+            if name in saved_modules:
+                sys.modules[name] = saved_modules[name]
+            else:
+                del sys.modules[name]
+
+
+def _check_can_activate(packages_to_folders: dict[str, str]):
+    for name, package_dir in packages_to_folders.items():
+        loaded_package_dir = _loaded_extensions.get(name)
+        if loaded_package_dir is not None and loaded_package_dir != package_dir:
+            raise RuntimeError(f"Can't activate environment: extension modules of {name!r} are already loaded from "
+                               f"{loaded_package_dir!r} and can't be unloaded")
+        module = sys.modules.get(name)
+        if module is None:
+            continue
+        if not _is_loaded_from_package(module, package_dir):
+            raise RuntimeError(f"Can't activate environment: {name!r} is already imported from outside of it")
+
+
+def _is_extension(module) -> bool:
+    if isinstance(getattr(module, '__loader__', None), ExtensionFileLoader):
+        return True
+    filename = getattr(module, '__file__', None) or ''
+    return filename.endswith(tuple(EXTENSION_SUFFIXES))
+
+
+def _is_loaded_from_package(module, package_dir: str) -> bool:
+    """Check if `module` is loaded from `package_dir` or from its cached copy."""
+    return _is_loaded_from(module, package_dir) or _is_loaded_from(module, cache.get(package_dir))
+
+
+def _is_loaded_from(module, package_dir: str) -> bool:
+    # Namespace packages have no file, only search locations
+    paths = [module.__file__] if getattr(module, '__file__', None) else list(getattr(module, '__path__', []))
+    real_package_dir = os.path.realpath(package_dir) + os.sep
+    return any(os.path.realpath(path).startswith(real_package_dir) for path in paths)
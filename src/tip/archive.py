@@ -0,0 +1,210 @@
+import io
+import os
+import json
+import shutil
+import secrets
+import tarfile
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tip import cache, config, packages
+from tip.environment import Environment
+from tip.util import parse_package_specifier
+
+
+MANIFEST_NAME = 'manifest.json'
+PACKAGES_DIR_NAME = 'site-packages'
+_COMPRESSIONS = {'.xz': 'xz', '.gz': 'gz', '.tgz': 'gz', '.bz2': 'bz2'}
+# Larger files are written by the reading thread in chunks, smaller ones are read into memory and handed to writers.
+_MAX_BUFFERED_FILE_SIZE = 1 << 20
+_WRITE_CHUNK_SIZE = 1 << 20
+
+
+def export(env: Environment, environment_name: str, path: str, *, exclude: set[str] | None = None) -> dict:
+    """
+    Write environment and all installed packages it needs into a single archive at `path`.
+
+    The archive is written as a stream and starts with a manifest, so it can be imported in one sequential read.
+    Packages identified by specifiers in `exclude` are not stored, e.g. the ones already shipped in another archive.
+    Compression is chosen by the extension of `path`. Returns the manifest.
+    """
+    package_specifiers = [packages.make_package_specifier(name, version) for name, version in env.packages.items()]
+    stored_package_specifiers = [package_specifier for package_specifier in packages.closure(package_specifiers)
+                                 if package_specifier not in (exclude or set())]
+    manifest = {
+        'environment': environment_name,
+        'packages': env.packages,
+        'closure': stored_package_specifiers,
+    }
+    with tarfile.open(path, mode=f"w|{_compression(path)}") as tar:
+        manifest_data = json.dumps(manifest, indent=2).encode('utf8')
+        manifest_info = tarfile.TarInfo(MANIFEST_NAME)
+        manifest_info.size = len(manifest_data)
+        tar.addfile(manifest_info, io.BytesIO(manifest_data))
+        for package_specifier in stored_package_specifiers:
+            name, version = parse_package_specifier(package_specifier)
+            tar.add(packages.locate(name, version), arcname=posixpath.join(PACKAGES_DIR_NAME, name, version))
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    """Read manifest from the archive or from the manifest JSON file at `path`."""
+    if not tarfile.is_tarfile(path):
+        with open(path, mode='r', encoding='utf8') as manifest_file:
+            return json.load(manifest_file)
+    with tarfile.open(path, mode='r|*') as tar:
+        return _read_manifest(tar)
+
+
+def import_(path: str, *, environment_name: str | None = None, jobs: int = 8, overwrite: bool = False) -> dict:
+    """
+    Import environment and its packages from the archive at `path` made by `export`.
+
+    The archive is read sequentially while files are written by `jobs` threads. Already installed packages are
+    skipped. New packages are unpacked into temporary directories and moved in place once complete, then linked and
+    cached. Returns the manifest with keys 'installed', 'skipped' and 'missing' added, the last one lists packages which
+    the environment needs but which are neither installed nor stored in the archive, see `export`'s `exclude`.
+    """
+    with tarfile.open(path, mode='r|*') as tar:
+        manifest = _read_manifest(tar)
+        environment_name = environment_name or manifest['environment']
+        environment_path = Environment.locate(environment_name)
+        if os.path.exists(environment_path) and not overwrite:
+            raise RuntimeError(f"Environment {environment_name!r} already exists")
+        skipped = {package_specifier for package_specifier in manifest['closure']
+                   if packages.is_installed(package_specifier)}
+        staging_dirs = _unpack_packages(tar, skipped, jobs)
+    installed = []
+    for package_specifier, staging_dir in staging_dirs.items():
+        try:
+            os.rename(staging_dir, packages.locate(*parse_package_specifier(package_specifier)))
+        except OSError:
+            shutil.rmtree(staging_dir)  # Installed by another process meanwhile
+            continue
+        packages.make_link(package_specifier)
+        installed.append(package_specifier)
+    if cache.is_enabled():
+        cache.prefetch([packages.locate(*parse_package_specifier(package_specifier))
+                        for package_specifier in installed], jobs=jobs)
+    os.makedirs(config.ENVIRONMENTS_DIR, exist_ok=True)
+    env = Environment(path=environment_path, packages=manifest['packages'])
+    env.save()
+    missing = packages.find_missing([packages.make_package_specifier(name, version)
+                                     for name, version in env.packages.items()])
+    return {**manifest, 'environment': environment_name, 'installed': installed, 'skipped': sorted(skipped),
+            'missing': missing}
+
+
+def _read_manifest(tar: tarfile.TarFile) -> dict:
+    member = tar.next()
+    if member is None or member.name != MANIFEST_NAME:
+        raise RuntimeError(f"Archive doesn't start with {MANIFEST_NAME!r}, it's not made by `tip export`")
+    with tar.extractfile(member) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _unpack_packages(tar: tarfile.TarFile, skipped: set[str], jobs: int) -> dict[str, str]:
+    """Unpack packages which are not `skipped` into staging directories, return them by package specifiers."""
+    staging_dirs: dict[str, str] = {}
+    try:
+        _unpack_members(tar, skipped, jobs, staging_dirs)
+    except BaseException:
+        for staging_dir in staging_dirs.values():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(staging_dir))  # Created for the staging directory if no version is installed
+            except OSError:
+                pass
+        raise
+    return staging_dirs
+
+
+def _unpack_members(tar: tarfile.TarFile, skipped: set[str], jobs: int, staging_dirs: dict[str, str]):
+    # Symbolic links are made after all files are written, so files are never written through them.
+    symlinks: list[tuple[str, str, str]] = []
+    pending_writes = threading.BoundedSemaphore(jobs * 4)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        while (member := tar.next()) is not None:
+            name, version, relative_path = _split_member_name(member.name)
+            package_specifier = packages.make_package_specifier(name, version)
+            if package_specifier in skipped:
+                continue
+            if package_specifier not in staging_dirs:
+                package_dir = packages.locate(name, version)
+                staging_dirs[package_specifier] = f"{package_dir}.{secrets.token_hex(8)}~"
+                os.makedirs(staging_dirs[package_specifier])
+            target_path = os.path.join(staging_dirs[package_specifier], *relative_path)
+            if member.isdir():
+                os.makedirs(target_path, exist_ok=True)
+            elif member.issym():
+                symlinks.append((staging_dirs[package_specifier], target_path, member.linkname))
+            elif member.isfile() and member.size > _MAX_BUFFERED_FILE_SIZE:
+                with tar.extractfile(member) as member_file:
+                    _copy_file(member_file, target_path, member.mode)
+            elif member.isfile():
+                with tar.extractfile(member) as member_file:
+                    data = member_file.read()
+                pending_writes.acquire()  # pylint: disable=consider-using-with  # Released by the writer
+                futures.append(executor.submit(_write_file, target_path, data, member.mode, pending_writes))
+            else:
+                raise RuntimeError(f"Archive member {member.name!r} has unsupported type, only files, directories "
+                                   f"and symbolic links are allowed")
+        for future in futures:
+            future.result()
+    _make_symlinks(symlinks)
+
+
+def _make_symlinks(symlinks: list[tuple[str, str, str]]):
+    """Make links `(staging_dir, link_path, link_target)`, raise if any of them leads outside of its staging dir."""
+    for staging_dir, link_path, link_target in symlinks:
+        _check_is_inside(os.path.dirname(link_path), staging_dir)
+        if os.path.lexists(link_path):
+            raise RuntimeError(f"Archive has both a link and a file or a directory at {link_path!r}")
+        os.symlink(link_target, link_path)
+    for staging_dir, link_path, _ in symlinks:
+        _check_is_inside(link_path, staging_dir)  # Resolved through all links, including the ones made later
+
+
+def _write_file(path: str, data: bytes, mode: int, pending_writes: threading.BoundedSemaphore):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode='wb') as f:
+            f.write(data)
+        os.chmod(path, mode & 0o777)
+    finally:
+        pending_writes.release()
+
+
+def _copy_file(member_file, path: str, mode: int):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode='wb') as f:
+        shutil.copyfileobj(member_file, f, _WRITE_CHUNK_SIZE)
+    os.chmod(path, mode & 0o777)
+
+
+def _split_member_name(member_name: str) -> tuple[str, str, list[str]]:
+    """Split archive member name into package name, package version and path inside the package."""
+    _check_is_relative(member_name)
+    parts = posixpath.normpath(member_name).split('/')
+    if len(parts) < 3 or parts[0] != PACKAGES_DIR_NAME:
+        raise RuntimeError(f"Unexpected archive member {member_name!r}")
+    return parts[1], parts[2], parts[3:]
+
+
+def _check_is_relative(path: str):
+    normalized_path = posixpath.normpath(path)
+    if posixpath.isabs(normalized_path) or normalized_path.split('/')[0] == '..':
+        raise RuntimeError(f"Archive member path {path!r} points outside of the package")
+
+
+def _check_is_inside(path: str, directory: str):
+    real_path = os.path.realpath(path)
+    real_directory = os.path.realpath(directory)
+    if real_path != real_directory and not real_path.startswith(real_directory + os.sep):
+        raise RuntimeError(f"Archive member path {path!r} points outside of the package")
+
+
+def _compression(path: str) -> str:
+    return _COMPRESSIONS.get(os.path.splitext(path)[1], '')
@@ -0,0 +1,146 @@
+import os
+import time
+import shutil
+import secrets
+import tempfile
+import subprocess
+
+from packaging.tags import parse_tag, sys_tags
+from packaging.utils import parse_wheel_filename
+
+from tip import config
+
+
+BUILD_CACHE_DIR = config.get('build_cache_dir') or os.path.join(config.TIP_DIR, 'builds')
+# Platform of the running interpreter with its libc, e.g. 'manylinux_2_36_x86_64' or 'musllinux_1_2_x86_64'. It's added
+# to the keys of wheels with generic 'linux_*' platform, which don't tell the libc they are built against.
+HOST_PLATFORM = next((tag.platform for tag in sys_tags() if tag.platform.startswith(('manylinux', 'musllinux'))),
+                     next(iter(sys_tags())).platform)
+
+
+def is_sdist(path: str) -> bool:
+    """Check if the distribution at `path` is a source distribution."""
+    return not path.endswith('.whl')
+
+
+def find(package_name: str, package_version: str) -> str | None:
+    """Find wheel built from the package sdist which suits the running interpreter or return None if it's not built."""
+    version_dir = os.path.join(BUILD_CACHE_DIR, package_name, package_version)
+    try:
+        keys = os.listdir(version_dir)
+    except FileNotFoundError:
+        return None
+    priorities = {str(tag): priority for priority, tag in enumerate(sys_tags())}
+    suitable_keys = [key for key in keys if _get_priority(key, priorities) is not None]
+    for key in sorted(suitable_keys, key=lambda key: _get_priority(key, priorities)):
+        build_dir = os.path.join(version_dir, key)
+        wheel_names = [name for name in os.listdir(build_dir) if name.endswith('.whl')]
+        if len(wheel_names) > 0:
+            return os.path.join(build_dir, wheel_names[0])
+    return None
+
+
+def build(sdist_path: str, package_name: str, package_version: str, temp_dir: str) -> str:
+    """
+    Build wheel from `sdist_path`, store it in the build cache and return its path there.
+
+    Wheels are stored by their tags, so a shared build cache serves each interpreter only wheels its tags accept.
+    """
+    wheel_dir = tempfile.mkdtemp(dir=temp_dir)
+    subprocess.run(f"pip wheel --no-deps --wheel-dir {wheel_dir} {sdist_path}", shell=True, check=True)
+    wheel_names = [name for name in os.listdir(wheel_dir) if name.endswith('.whl')]
+    if len(wheel_names) != 1:
+        raise RuntimeError(f"Expected one wheel built from {sdist_path!r}, got {wheel_names}")
+    key = _make_key(wheel_names[0])
+    if _get_priority(key, {str(tag): priority for priority, tag in enumerate(sys_tags())}) is None:
+        raise RuntimeError(f"Wheel {wheel_names[0]!r} built from {sdist_path!r} doesn't suit the running interpreter")
+    build_dir = _locate(package_name, package_version, key)
+    os.makedirs(build_dir, exist_ok=True)
+    wheel_path = os.path.join(build_dir, wheel_names[0])
+    temp_path = os.path.join(build_dir, secrets.token_hex(16) + '~')
+    shutil.copyfile(os.path.join(wheel_dir, wheel_names[0]), temp_path)
+    os.replace(temp_path, wheel_path)
+    return wheel_path
+
+
+def list_entries() -> list[dict]:
+    """List wheels in the build cache."""
+    entries = []
+    try:
+        package_names = sorted(os.listdir(BUILD_CACHE_DIR))
+    except FileNotFoundError:
+        return entries
+    for package_name in package_names:
+        for package_version in sorted(os.listdir(os.path.join(BUILD_CACHE_DIR, package_name))):
+            version_dir = os.path.join(BUILD_CACHE_DIR, package_name, package_version)
+            for tag in sorted(os.listdir(version_dir)):
+                build_dir = os.path.join(version_dir, tag)
+                for wheel_name in os.listdir(build_dir):
+                    if not wheel_name.endswith('.whl'):
+                        continue
+                    wheel_stat = os.stat(os.path.join(build_dir, wheel_name))
+                    entries.append({
+                        'name': package_name,
+                        'version': package_version,
+                        'tag': tag,
+                        'path': os.path.join(build_dir, wheel_name),
+                        'size': wheel_stat.st_size,
+                        'mtime': wheel_stat.st_mtime,
+                    })
+    return entries
+
+
+def prune(package_specifiers: set[str] | None = None, *, older_than: float | None = None) -> list[dict]:
+    """
+    Remove wheels from the build cache and return the removed entries.
+
+    Only wheels of `package_specifiers` and wheels built more than `older_than` seconds ago are removed, when these
+    are given.
+    """
+    now = time.time()
+    removed = []
+    for entry in list_entries():
+        if package_specifiers is not None and f"{entry['name']}=={entry['version']}" not in package_specifiers:
+            continue
+        if older_than is not None and now - entry['mtime'] <= older_than:
+            continue
+        build_dir = os.path.dirname(entry['path'])
+        shutil.rmtree(build_dir, ignore_errors=True)
+        _remove_empty_dirs(os.path.dirname(build_dir))
+        removed.append(entry)
+    return removed
+
+
+def _make_key(wheel_name: str) -> str:
+    """Make build cache key from wheel tags, e.g. 'cp311-cp311-linux_x86_64+manylinux_2_35_x86_64'."""
+    _, _, _, tags = parse_wheel_filename(wheel_name)
+    key = wheel_name.removesuffix('.whl').rsplit('-', 3)[-3:]
+    if any(tag.platform.startswith('linux_') for tag in tags):
+        return f"{'-'.join(key)}+{HOST_PLATFORM}"
+    return '-'.join(key)
+
+
+def _get_priority(key: str, priorities: dict[str, int]) -> int | None:
+    """Get priority of the wheel stored by `key` among `priorities` of interpreter tags, None if it doesn't suit."""
+    tag_set, _, host_platform = key.partition('+')
+    if host_platform and host_platform != HOST_PLATFORM:
+        return None
+    try:
+        tags = parse_tag(tag_set)
+    except ValueError:
+        return None  # Not a tag, e.g. a key used by older versions of tip
+    matching_priorities = [priorities[str(tag)] for tag in tags if str(tag) in priorities]
+    return min(matching_priorities, default=None)
+
+
+def _locate(package_name: str, package_version: str, tag: str) -> str:
+    return os.path.join(BUILD_CACHE_DIR, package_name, package_version, tag)
+
+
+def _remove_empty_dirs(path: str):
+    while os.path.abspath(path) != os.path.abspath(BUILD_CACHE_DIR):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -1,11 +1,15 @@
 import os
+import time
+import errno
 import shutil
 import secrets
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from tip import config
 
 
 CACHE_DIR = config.get('cache_dir')
+STALE_TEMP_DIR_AGE = 60 * 60
 
 
 def get(package_dir):
@@ -17,18 +21,48 @@ def get(package_dir):
         cached_mtime = os.path.getmtime(cache_dir)
     except FileNotFoundError:
         cached_mtime = -1
-    if cached_mtime > os.path.getmtime(package_dir):
-        return package_dir
-    os.makedirs(cache_dir, exist_ok=True)
-    temp_dir = os.path.join(CACHE_DIR, secrets.token_hex(16) + '~')
-    shutil.copytree(package_dir, temp_dir)
+    if cached_mtime >= os.path.getmtime(package_dir):
+        return cache_dir
+    # Only complete copies are renamed into `cache_dir`, so a partial one is never taken as fresh.
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    temp_dir = __make_temp_path()
+    shutil.copytree(package_dir, temp_dir, symlinks=True)
+    if cached_mtime != -1:
+        __remove_stale(cache_dir)
     try:
         os.rename(temp_dir, cache_dir)
-    except FileExistsError:
-        shutil.rmtree(temp_dir)
+    except OSError as ex:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if ex.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+            raise
+        # Another process has populated the cache first.
     return cache_dir
 
 
+def prefetch(package_dirs, *, jobs=8, on_done=None):
+    """
+    Populate the cache with `package_dirs` using up to `jobs` concurrent copies.
+
+    Packages that are already cached and up to date are skipped, so prefetch can be safely interrupted and rerun.
+    `on_done(package_dir, error)` is called after each package is processed, `error` is None on success.
+    """
+    if CACHE_DIR is None:
+        raise RuntimeError("Cache is disabled, set 'cache_dir' in config to enable it")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _remove_stale_temp_dirs()
+    errors = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(get, package_dir): package_dir for package_dir in package_dirs}
+        for future in as_completed(futures):
+            package_dir = futures[future]
+            error = future.exception()
+            if error is not None:
+                errors[package_dir] = error
+            if on_done is not None:
+                on_done(package_dir, error)
+    return errors
+
+
 def clear(package_dir):
     """Clear cache."""
     if CACHE_DIR is None:
@@ -48,6 +82,33 @@ def __path(package_dir):
     return os.path.join(CACHE_DIR, name, version)
 
 
+def __remove_stale(cache_dir):
+    """Move the stale copy aside before removing it, renaming over a non-empty directory is not possible."""
+    stale_dir = __make_temp_path()
+    try:
+        os.rename(cache_dir, stale_dir)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def __make_temp_path():
+    return os.path.join(CACHE_DIR, secrets.token_hex(16) + '~')
+
+
+def _remove_stale_temp_dirs():
+    """Remove temporary copies left by interrupted cache population."""
+    now = time.time()
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.name.endswith('~'):
+            continue
+        try:
+            if now - entry.stat(follow_symlinks=False).st_mtime > STALE_TEMP_DIR_AGE:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
 def is_enabled():
     """Check if cache is enabled."""
     return CACHE_DIR is not None
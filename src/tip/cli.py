@@ -1,14 +1,20 @@
 import os
 import sys
 import json
+import time
+import tempfile
 from collections import deque
 from typing import no_type_check
 
 import rich
 import click
+import rich.rule
 import rich.tree
+import rich.table
+import rich.progress
 
-from tip import cache, config, packages, runner
+from tip import (archive, builds, cache, client, config, daemon, import_trace, integrity, matrix, packages, runner,
+                 telemetry, view)
 from tip.config import LINKS_DIR
 from tip.environment import Environment
 
@@ -23,6 +29,11 @@ def config_():
     """Configuration management."""
 
 
+@app.group(name="cache")
+def cache_():
+    """Cache management."""
+
+
 @app.command()
 @click.argument('environment_name', type=str)
 def activate(environment_name: str):
@@ -49,12 +60,15 @@ def info():
 @app.command()
 @click.argument('package_specifiers', type=str, nargs=-1)
 @click.option('--env', '-e', 'environment_path', type=str, default=None)
-def install(package_specifiers: list[str], environment_path: str):
+@click.option('--reuse-installed', 'reuse_installed', is_flag=True,
+              help="Prefer installed versions of dependencies when they satisfy requirements")
+def install(package_specifiers: list[str], environment_path: str, reuse_installed: bool):
     """
     Download and install packages to make them runnable with `tip run`.
 
     When PACKAGE_SPECIFIERS is not empty, install all these packages. If given ENVIRONMENT_PATH, install all packages
-    from this environment. Otherwise install packages from the active environment.
+    from this environment. Otherwise install packages from the active environment. With REUSE_INSTALLED dependencies
+    are resolved to already installed versions whenever possible instead of the versions pip picks.
     """
     if not _at_most_one(package_specifiers, environment_path):
         raise click.ClickException("At most one of PACKAGE_SPECIFIERS or ENVIRONMENT_PATH should be specified")
@@ -63,9 +77,12 @@ def install(package_specifiers: list[str], environment_path: str):
         env = Environment.load(path=environment_path)
         package_specifiers = [packages.make_package_specifier(k, v) for k, v in env.packages.items()]
     try:
-        packages.install(package_specifiers)
+        savings = packages.install(package_specifiers, reuse_installed=reuse_installed)
     except Exception as ex:
         raise click.ClickException(str(ex))
+    if reuse_installed:
+        click.echo(f"Reused installed versions: {savings['downloads']} download(-s) and "
+                   f"{savings['bytes'] / 2**20:.1f} MB avoided")
 
 
 @app.command()
@@ -86,6 +103,140 @@ def uninstall(package_specifiers: tuple[str]):
         cache.clear(package_dir)
 
 
+@app.command()
+@click.option('--env', '-e', 'environment_paths', type=str, multiple=True)
+@click.option('--all-envs', 'all_envs', is_flag=True, default=False, help="Prefetch packages of all environments")
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=8, help="Number of concurrent copies")
+def prefetch(environment_paths: tuple[str], all_envs: bool, jobs: int):
+    """
+    Copy packages of environments into the cache before they are imported.
+
+    Prefetches packages of environments at ENVIRONMENT_PATHS, of all environments if ALL_ENVS is set or of the active
+    environment otherwise. Up to date packages are skipped, so it's safe to rerun it after interruption.
+    """
+    if not _at_most_one(environment_paths, all_envs):
+        raise click.ClickException("At most one of ENVIRONMENT_PATHS or ALL_ENVS should be specified")
+    if not cache.is_enabled():
+        raise click.ClickException("Cache is disabled, set 'cache_dir' in config to enable it")
+    if all_envs:
+        environment_paths = tuple(Environment.locate(name) for name in Environment.names())
+    elif len(environment_paths) == 0:
+        environment_paths = (Environment.locate(config.get('active_environment_name')),)
+    package_dirs = _locate_installed_package_dirs(environment_paths)
+    with rich.progress.Progress() as progress:
+        task = progress.add_task("Prefetching", total=len(package_dirs))
+
+        def on_done(package_dir, error):
+            if error is not None:
+                progress.console.print(f"Failed to prefetch {package_dir!r}: {error}")
+            progress.advance(task)
+
+        errors = cache.prefetch(sorted(package_dirs), jobs=jobs, on_done=on_done)
+    if len(errors) > 0:
+        raise click.ClickException(f"Failed to prefetch {len(errors)} package(-s)")
+
+
+@app.command()
+@click.argument('environment_name', type=str)
+@click.argument('output_path', type=str)
+@click.option('--exclude-from', 'exclude_from', type=str, default=None,
+              help="Don't store packages listed in this archive or manifest")
+def export(environment_name: str, output_path: str, exclude_from: str | None):
+    """
+    Export environment ENVIRONMENT_NAME with all packages it needs into archive at OUTPUT_PATH.
+
+    Compression is chosen by OUTPUT_PATH extension, e.g. '.tar.xz'. Packages already stored in archive EXCLUDE_FROM,
+    or listed in its manifest, are skipped. Use `tip import` to install the archive.
+    """
+    try:
+        env = Environment.load(name=environment_name)
+    except FileNotFoundError as ex:
+        raise click.ClickException(f"Environment {environment_name!r} doesn't exist") from ex
+    exclude = None
+    if exclude_from is not None:
+        try:
+            exclude = set(archive.read_manifest(exclude_from)['closure'])
+        except (OSError, json.JSONDecodeError, KeyError, RuntimeError) as ex:
+            raise click.ClickException(f"Can't read manifest from {exclude_from!r}: {ex}") from ex
+    try:
+        manifest = archive.export(env, environment_name, output_path, exclude=exclude)
+    except RuntimeError as ex:
+        raise click.ClickException(str(ex)) from ex
+    click.echo(f"Exported {len(manifest['closure'])} package(-s) to {output_path!r}")
+
+
+@app.command(name='import')
+@click.argument('archive_path', type=str)
+@click.option('--name', '-n', 'environment_name', type=str, default=None, help="Import environment under this name")
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=8, help="Number of concurrent writers")
+@click.option('--overwrite', 'overwrite', is_flag=True, help="Overwrite existing environment")
+def import_(archive_path: str, environment_name: str | None, jobs: int, overwrite: bool):
+    """
+    Import environment and its packages from archive at ARCHIVE_PATH made by `tip export`.
+
+    Already installed packages are skipped. The environment is saved under ENVIRONMENT_NAME or under its original name.
+    Fails if the environment needs packages which are neither installed nor stored in the archive.
+    """
+    try:
+        result = archive.import_(archive_path, environment_name=environment_name, jobs=jobs, overwrite=overwrite)
+    except RuntimeError as ex:
+        raise click.ClickException(str(ex)) from ex
+    click.echo(f"Imported {result['environment']!r}: {len(result['installed'])} package(-s) installed, "
+               f"{len(result['skipped'])} already installed")
+    for package_specifier in result['missing']:
+        click.echo(f"Package {package_specifier!r} is neither installed nor stored in the archive", err=True)
+    if len(result['missing']) > 0:
+        raise click.ClickException(f"{len(result['missing'])} package(-s) needed by the environment are missing, "
+                                   f"install them with `tip install`")
+
+
+@app.command()
+@click.option('--env', '-e', 'environment_path', type=str, default=None)
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=8, help="Number of concurrent workers")
+def verify(environment_path: str | None, jobs: int):
+    """
+    Check files of installed packages against their RECORD files.
+
+    If ENVIRONMENT_PATH is set, only packages of this environment are checked, otherwise all installed packages.
+    Damaged packages can be fixed with `tip repair`.
+    """
+    problems = integrity.verify(_select_packages_to_verify(environment_path), jobs=jobs)
+    _print_integrity_problems(problems)
+    if len(problems) > 0:
+        raise click.ClickException(f"{len(problems)} package(-s) are damaged")
+
+
+@app.command()
+@click.option('--env', '-e', 'environment_path', type=str, default=None)
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=8, help="Number of concurrent workers")
+def repair(environment_path: str | None, jobs: int):
+    """
+    Restore damaged files of installed packages from their wheels and refresh their cache.
+
+    Packages are checked as by `tip verify`. Only damaged files are restored, the wheel is taken from the build cache
+    or downloaded again.
+    """
+    problems = integrity.verify(_select_packages_to_verify(environment_path), jobs=jobs)
+    _print_integrity_problems(problems)
+    failed_package_specifiers = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for package_specifier, package_problems in problems.items():
+            try:
+                unrepaired_paths = integrity.repair(package_specifier, package_problems, temp_dir)
+            except Exception as ex:  # pylint: disable=broad-except
+                click.echo(f"Failed to repair {package_specifier!r}: {ex}", err=True)
+                failed_package_specifiers.append(package_specifier)
+                continue
+            if len(unrepaired_paths) > 0:
+                click.echo(f"Failed to restore {len(unrepaired_paths)} file(-s) of {package_specifier!r}, reinstall it",
+                           err=True)
+                failed_package_specifiers.append(package_specifier)
+            else:
+                click.echo(f"Repaired {package_specifier!r}")
+    if len(failed_package_specifiers) > 0:
+        raise click.ClickException(f"{len(failed_package_specifiers)} package(-s) are not repaired")
+
+
 @app.command(name='list')
 @click.option('--env', '-e', 'environment_path', type=str, default=None)
 @click.option('--installed', '-i', 'installed', is_flag=True, default=False)
@@ -149,18 +300,122 @@ def dependencies(environment_path: str | None):
 @click.option('--env', '-e', 'environment_path', type=str, default=None)
 @click.option('-c', 'command')
 @click.option('--install-missing', 'install_missing', is_flag=True)
+@click.option('--record-imports', 'record_imports_path', type=str, default=None,
+              help="Save modules imported from the environment to this trace file")
+@click.option('--replay-imports', 'replay_imports_path', type=str, default=None,
+              help="Warm up modules from this trace file before running")
+@click.option('--preload', 'preload', is_flag=True, help="Import modules from the replayed trace before running")
+@click.option('--no-view', 'no_view', is_flag=True,
+              help="Import packages with the finder even if environment is materialized")
+@click.option('--watch', 'watch', is_flag=True, help="Rerun when modules imported from working directory change")
 @click.argument('args', nargs=-1, type=click.UNPROCESSED)
-def run(module_name: str, command: str, environment_path: str, install_missing: bool, args: tuple[str]):
+def run(module_name: str, command: str, environment_path: str, install_missing: bool, *,
+        record_imports_path: str | None, replay_imports_path: str | None, preload: bool, no_view: bool, watch: bool,
+        args: tuple[str]):
     """
     Run a module or a script using given environment at ENVIRONMENT_PATH.
 
     In order to use environment all packages must be installed or run with '--install-missing'.
     """
+    if preload and replay_imports_path is None:
+        raise click.ClickException("PRELOAD requires REPLAY_IMPORTS_PATH")
+    if watch and command:
+        raise click.ClickException("WATCH can't be used with COMMAND")
+    if watch and not (module_name or args):
+        raise click.ClickException("WATCH requires a module or a file to run")
     if environment_path is None:
         env = Environment.load(name=config.get('active_environment_name'))
     else:
         env = Environment.load(path=environment_path)
-    return runner.run(module_name, command, env, install_missing, args)
+    return runner.run(module_name, command, env, install_missing, args, record_imports_path=record_imports_path,
+                      replay_imports_path=replay_imports_path, preload=preload, use_view=not no_view, watch=watch)
+
+
+@app.command()
+@click.argument('environment_name', type=str)
+@click.option('--remove', 'remove_', is_flag=True, help="Remove the view instead of building it")
+def materialize(environment_name: str, remove_: bool):
+    """
+    Build a view of environment ENVIRONMENT_NAME: a directory with links to its packages.
+
+    `tip run` puts the view on `sys.path` instead of using the custom import finder. The view is rebuilt every time the
+    environment is saved. Packages of the environment must be installed and must not provide the same top-level names.
+    With the cache enabled, the view links to cached packages and `tip run` caches missing ones before using it.
+    Rebuild the view after changing `cache_dir`.
+    """
+    if remove_:
+        view.remove(environment_name)
+        return
+    try:
+        env = Environment.load(name=environment_name)
+    except FileNotFoundError as ex:
+        raise click.ClickException(f"Environment {environment_name!r} doesn't exist") from ex
+    try:
+        view_path = view.build(environment_name, env.packages)
+    except RuntimeError as ex:
+        raise click.ClickException(str(ex)) from ex
+    click.echo(f"Materialized {environment_name!r} at {view_path!r}")
+
+
+@app.command(name='matrix', context_settings={'ignore_unknown_options': True})
+@click.option('--envs', 'pattern', type=str, default='*', help="Shell-style pattern of environment names")
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=os.cpu_count(),
+              help="Number of concurrent runs")
+@click.option('--output-dir', '-o', 'output_dir', type=str, default=None, help="Save output of each run to this dir")
+@click.option('--json', 'as_json', is_flag=True, help="Print results as JSON")
+@click.argument('args', nargs=-1, required=True, type=click.UNPROCESSED)
+def matrix_(pattern: str, jobs: int, output_dir: str | None, as_json: bool, args: tuple[str]):
+    """
+    Run the same module or script in every environment matching PATTERN, as `tip run` does.
+
+    Runs are executed concurrently, each run output is captured separately. Packages of all environments are cached
+    once before runs start. Prints exit code and duration of each run and output of the failed ones, or everything as
+    JSON. Exits with an error if any run fails.
+    """
+    environment_names = matrix.select_environments(pattern)
+    if len(environment_names) == 0:
+        raise click.ClickException(f"No environments match {pattern!r}")
+    missing_package_specifiers, prefetch_errors = matrix.warm_up(environment_names, jobs=jobs)
+    for package_specifier in missing_package_specifiers:
+        click.echo(f"Package {package_specifier!r} is not installed, environments which need it will fail", err=True)
+    for package_dir, error in prefetch_errors.items():
+        click.echo(f"Failed to prefetch {package_dir!r}: {error}", err=True)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def on_done(result):
+        if output_dir is None:
+            return
+        for stream in ('stdout', 'stderr'):
+            output_path = os.path.join(output_dir, f"{result['environment']}.{stream}")
+            with open(output_path, mode='w', encoding='utf8') as output_file:
+                output_file.write(result[stream])
+
+    results = matrix.run(environment_names, args, jobs=jobs, on_done=on_done)
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+    else:
+        _print_matrix_results(results, show_failed_output=output_dir is None)
+    failed_count = sum(result['exit_code'] != 0 for result in results)
+    if failed_count > 0:
+        raise click.ClickException(f"{failed_count} of {len(results)} run(-s) failed")
+
+
+@app.command()
+@click.argument('trace_path', type=str)
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=8, help="Number of concurrent workers")
+@click.option('--no-compile', 'no_compile', is_flag=True, help="Don't compile traced modules")
+def warm(trace_path: str, jobs: int, no_compile: bool):
+    """
+    Warm up modules recorded in the import trace at TRACE_PATH.
+
+    Copies their packages into the cache, reads their files into the page cache and compiles them. The trace is
+    produced by `tip run --record-imports`.
+    """
+    trace = import_trace.load(trace_path)
+    missing_paths = import_trace.warm(trace, jobs=jobs, compile_modules=not no_compile)
+    for path in missing_paths:
+        click.echo(f"Traced file {path!r} not found, skipping")
 
 
 @click.command()
@@ -237,6 +492,60 @@ def remove(package_specifiers: tuple[str], environment_path: str | None):
     env.save()
 
 
+@app.command()
+@click.option('--runs', '-r', 'last_runs', type=int, default=10, help="Number of recent runs to summarize")
+@click.option('--top', '-n', 'top', type=int, default=10, help="Number of slowest packages to show")
+@click.option('--path', '-p', 'telemetry_path', type=str, default=None, help="JSONL telemetry file to read")
+def stats(last_runs: int, top: int, telemetry_path: str | None):
+    """
+    Summarize install telemetry: the slowest packages and stages across recent runs.
+
+    Reads spans from TELEMETRY_PATH or from the `telemetry_path` config key, which must be in 'jsonl' format.
+    """
+    if telemetry_path is None and telemetry.TELEMETRY_FORMAT != 'jsonl':
+        raise click.ClickException("Stats can only be read from telemetry in 'jsonl' format")
+    try:
+        spans = telemetry.load(telemetry_path)
+    except (RuntimeError, FileNotFoundError) as ex:
+        raise click.ClickException(str(ex)) from ex
+    summary = telemetry.summarize(spans, last_runs=last_runs)
+    for group, title, limit in (('stages', "Stages", None), ('packages', "Slowest packages", top)):
+        table = rich.table.Table(title=title)
+        for column in ("Name", "Total, s", "Spans", "Downloaded, MB", "Written, MB"):
+            table.add_column(column, justify='left' if column == "Name" else 'right')
+        rows = sorted(summary[group].items(), key=lambda item: item[1]['duration'], reverse=True)
+        for name, totals in rows[:limit]:
+            table.add_row(
+                name,
+                f"{totals['duration']:.2f}",
+                str(totals['count']),
+                f"{totals['bytes_transferred'] / 2**20:.1f}",
+                f"{totals['bytes_written'] / 2**20:.1f}",
+            )
+        rich.print(table)
+
+
+@app.command(name='daemon')
+@click.option('--stop', 'stop', is_flag=True, help="Stop the running daemon")
+def daemon_(stop: bool):
+    """
+    Serve tip commands from a long-running process to make them fast.
+
+    While the daemon is running, `tip` commands that only manage packages, environments and config are executed by it
+    over a Unix socket. Commands are executed one at a time. Restart the daemon after changing config.
+    """
+    if stop:
+        if not client.stop():
+            raise click.ClickException("tip daemon is not running")
+        return
+    try:
+        daemon.serve(app)
+    except RuntimeError as ex:
+        raise click.ClickException(str(ex)) from ex
+    except KeyboardInterrupt:
+        pass
+
+
 @config_.command('set')
 @click.argument('key', type=str)
 @click.argument('value', type=str)
@@ -252,11 +561,94 @@ def unset(key: str):
     config[key] = None
 
 
+@cache_.command('builds')
+@click.argument('package_specifiers', type=str, nargs=-1)
+@click.option('--prune', 'prune', is_flag=True, help="Remove wheels instead of listing them")
+@click.option('--older-than', 'older_than_days', type=float, default=None, help="Only wheels built days ago")
+def builds_(package_specifiers: tuple[str], prune: bool, older_than_days: float | None):
+    """
+    List or prune wheels built from source distributions.
+
+    When PACKAGE_SPECIFIERS are given, only wheels of these packages are affected. With PRUNE and without filters all
+    wheels are removed.
+    """
+    selected_package_specifiers = set(package_specifiers) if len(package_specifiers) > 0 else None
+    older_than = older_than_days * 24 * 60 * 60 if older_than_days is not None else None
+    if prune:
+        for entry in builds.prune(selected_package_specifiers, older_than=older_than):
+            click.echo(f"Removed {entry['path']}")
+        return
+    table = rich.table.Table(title=builds.BUILD_CACHE_DIR)
+    for column in ("Package", "Tag", "Size, MB", "Age, days"):
+        table.add_column(column)
+    now = time.time()
+    for entry in builds.list_entries():
+        package_specifier = packages.make_package_specifier(entry['name'], entry['version'])
+        age = now - entry['mtime']
+        if selected_package_specifiers is not None and package_specifier not in selected_package_specifiers:
+            continue
+        if older_than is not None and age <= older_than:
+            continue
+        table.add_row(package_specifier, entry['tag'], f"{entry['size'] / 2**20:.1f}", f"{age / (24 * 60 * 60):.1f}")
+    rich.print(table)
+
+
 def _at_most_one(*args: bool) -> bool:
     """Returns True if at most one of the arguments is True."""
     return sum(bool(x) for x in args) <= 1
 
 
+def _select_packages_to_verify(environment_path: str | None) -> list[str]:
+    if environment_path is None:
+        return packages.list_installed()
+    env = Environment.load(path=environment_path)
+    package_specifiers = []
+    for name, version in env.packages.items():
+        package_specifier = packages.make_package_specifier(name, version)
+        if packages.is_installed(package_specifier):
+            package_specifiers.append(package_specifier)
+        else:
+            click.echo(f"Package {package_specifier!r} is not installed, skipping")
+    return package_specifiers
+
+
+def _print_integrity_problems(problems: dict[str, list[dict]]):
+    for package_specifier, package_problems in problems.items():
+        package_tree = rich.tree.Tree(f"📦 {package_specifier}")
+        for problem in package_problems:
+            package_tree.add(f"{problem['problem']}: {problem['path']}")
+        rich.print(package_tree)
+
+
+def _print_matrix_results(results: list[dict], show_failed_output: bool):
+    table = rich.table.Table()
+    for column in ("Environment", "Exit code", "Duration, s"):
+        table.add_column(column)
+    for result in results:
+        table.add_row(result['environment'], str(result['exit_code']), f"{result['duration']:.2f}")
+    rich.print(table)
+    if not show_failed_output:
+        return
+    for result in results:
+        if result['exit_code'] != 0:
+            rich.print(rich.rule.Rule(result['environment']))
+            click.echo(result['stdout'], nl=False)
+            click.echo(result['stderr'], nl=False, err=True)
+
+
+def _locate_installed_package_dirs(environment_paths: tuple[str, ...]) -> set[str]:
+    package_dirs = set()
+    for environment_path in environment_paths:
+        env = Environment.load(path=environment_path)
+        for name, version in env.packages.items():
+            package_dir = packages.locate(name, version)
+            if not os.path.isdir(package_dir):
+                click.echo(f"Package '{name}=={version}' is not installed, skipping")
+                continue
+            package_dirs.add(package_dir)
+    return package_dirs
+
+
 def _make_installed_packages_tree() -> rich.tree.Tree:
     site_packages_dir = config.get('site_packages_dir')
     tree = rich.tree.Tree(site_packages_dir)
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import socket
+import importlib
+
+
+# Only the standard library is imported here, forwarding a command must not pay for importing `tip.cli`.
+# Same as `os.path.join(config.TIP_DIR, "daemon.sock")`, without loading the config.
+SOCKET_PATH = os.path.join(os.path.dirname(os.path.dirname(sys.argv[0])), "daemon.sock")
+# Commands which only work with TIP state and can be executed by the daemon on behalf of the client.
+COMMANDS = frozenset({'activate', 'add', 'config', 'create', 'dependencies', 'info', 'install', 'list', 'remove',
+                      'uninstall'})
+MAX_MESSAGE_SIZE = 1 << 16
+STANDARD_FDS = (0, 1, 2)
+
+
+def main():
+    """Run `tip`: forward the command to the daemon if it's running, otherwise execute it in this process."""
+    exit_code = forward(sys.argv[1:])
+    if exit_code is None:
+        importlib.import_module('tip.cli').app()
+        return
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(exit_code)  # Skip saving config at exit, the daemon owns it
+
+
+def forward(args: list[str]) -> int | None:
+    """
+    Execute `tip` command with arguments `args` by the running daemon and return its exit code.
+
+    Returns None if the command can't be executed by the daemon or the daemon is not running. Standard streams and
+    environment variables of the current process are passed to the daemon, so the command output goes directly to them.
+    """
+    if len(args) == 0 or args[0] not in COMMANDS:
+        return None
+    try:
+        connection = connect()
+    except OSError:
+        return None
+    with connection:
+        request = json.dumps({'args': args, 'cwd': os.getcwd(), 'environ': dict(os.environ)}).encode('utf8')
+        try:
+            socket.send_fds(connection, [request], list(STANDARD_FDS))
+        except OSError:
+            return None
+        connection.shutdown(socket.SHUT_WR)
+        response = receive_all(connection)
+    try:
+        return json.loads(response)['exit_code']
+    except (json.decoder.JSONDecodeError, KeyError):
+        print("tip daemon has failed to execute the command", file=sys.stderr)
+        return 1
+
+
+def stop() -> bool:
+    """Stop the running daemon, returns False if it's not running."""
+    try:
+        connection = connect()
+    except OSError:
+        return False
+    with connection:
+        connection.sendall(json.dumps({'stop': True}).encode('utf8'))
+        connection.shutdown(socket.SHUT_WR)
+        receive_all(connection)
+    return True
+
+
+def connect() -> socket.socket:
+    """Connect to the daemon socket, raises OSError if the daemon is not running."""
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(SOCKET_PATH)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def receive_all(connection: socket.socket) -> bytes:
+    """Receive data from `connection` until the other side shuts down writing."""
+    chunks = []
+    while chunk := connection.recv(MAX_MESSAGE_SIZE):
+        chunks.append(chunk)
+    return b''.join(chunks)
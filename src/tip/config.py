@@ -11,6 +11,7 @@ from typing import Any
 BIN_DIR = os.path.dirname(sys.argv[0])
 TIP_DIR = os.path.dirname(BIN_DIR)
 LINKS_DIR = os.path.join(TIP_DIR, "links")
+VIEWS_DIR = os.path.join(TIP_DIR, "views")
 ENVIRONMENTS_DIR = os.path.join(TIP_DIR, "environments")
 CONFIG_PATH = os.path.join(TIP_DIR, "config.json")
 
@@ -92,8 +93,11 @@ def _load_config_dict():
 
 
 def _dump_config_dict(config):
-    with open(CONFIG_PATH, mode='w', encoding='utf8') as f:
+    # Written to a temporary file first, so processes running concurrently never read a partially written config.
+    temp_path = f"{CONFIG_PATH}.{os.getpid()}~"
+    with open(temp_path, mode='w', encoding='utf8') as f:
         json.dump(config, f, indent=2)
+    os.replace(temp_path, CONFIG_PATH)
 
 
 def _enable_setkey():
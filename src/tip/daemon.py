@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import signal
+import socket
+import traceback
+import contextlib
+
+from tip import client, config, packages
+from tip.client import SOCKET_PATH
+from tip.environment import Environment
+
+
+# SIGTERM received while a command is executed stops the daemon after the command finishes.
+_is_executing = False
+_is_stop_requested = False
+
+
+def serve(app):
+    """
+    Serve `tip` commands of click group `app` over the Unix socket at `SOCKET_PATH` until stopped.
+
+    Config, modules, environments and installed packages stay loaded between commands, the last two are reread only
+    after they change. Commands are executed one at a time in the working directory and with environment variables of
+    the client, so mutations of the environments and of the config never interleave; the config is saved after each
+    command. Settings which are read at import time, like `cache_dir`, are applied after the daemon restarts.
+    """
+    try:
+        client.connect().close()
+    except OSError:
+        pass
+    else:
+        raise RuntimeError(f"tip daemon is already running at {SOCKET_PATH!r}")
+    try:
+        os.unlink(SOCKET_PATH)
+    except FileNotFoundError:
+        pass
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    Environment.keep_in_memory()
+    packages.keep_in_memory()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(SOCKET_PATH)
+        os.chmod(SOCKET_PATH, 0o600)
+        server.listen()
+        try:
+            while not _is_stop_requested:
+                connection, _ = server.accept()
+                with connection:
+                    try:
+                        if not _handle(connection, app):
+                            break
+                    except OSError as ex:
+                        print(f"tip daemon has failed to handle a request: {ex}", file=sys.stderr)
+        finally:
+            os.unlink(SOCKET_PATH)
+
+
+def _handle(connection: socket.socket, app) -> bool:
+    """Handle a request, returns False if the daemon should stop."""
+    message, fds, _, _ = socket.recv_fds(connection, client.MAX_MESSAGE_SIZE, len(client.STANDARD_FDS))
+    try:
+        try:
+            request = json.loads(message + client.receive_all(connection))
+        except json.decoder.JSONDecodeError:
+            return True  # Not a request, e.g. a check whether the daemon is running
+        if request.get('stop', False):
+            connection.sendall(json.dumps({'exit_code': 0}).encode('utf8'))
+            return False
+        if len(fds) != len(client.STANDARD_FDS):
+            return True
+        with _redirect_standard_fds(fds):
+            exit_code = _execute(app, request['args'], request['cwd'], request['environ'])
+    finally:
+        for fd in fds:
+            os.close(fd)
+    connection.sendall(json.dumps({'exit_code': exit_code}).encode('utf8'))
+    return True
+
+
+def _execute(app, args: list[str], cwd: str, environ: dict[str, str]) -> int:
+    global _is_executing
+    daemon_cwd = os.getcwd()
+    daemon_environ = dict(os.environ)
+    _is_executing = True
+    try:
+        os.chdir(cwd)
+        _replace_environ(environ)
+        app.main(args=args, prog_name='tip', standalone_mode=True)
+    except SystemExit as ex:
+        if ex.code is None or isinstance(ex.code, int):
+            return ex.code or 0
+        print(ex.code, file=sys.stderr)
+        return 1
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return 1
+    finally:
+        _is_executing = False
+        os.chdir(daemon_cwd)
+        _replace_environ(daemon_environ)
+        config._dump_config_dict(config._config_dict)
+    return 0
+
+
+def _replace_environ(environ: dict[str, str]):
+    """Replace environment variables of the process, subprocesses of the commands inherit them."""
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+def _on_sigterm(*_):
+    global _is_stop_requested
+    if not _is_executing:
+        sys.exit(0)
+    _is_stop_requested = True
+
+
+@contextlib.contextmanager
+def _redirect_standard_fds(fds: list[int]):
+    """Temporarily replace standard file descriptors of the process with `fds`."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(fd) for fd in client.STANDARD_FDS]
+    for fd, new_fd in zip(client.STANDARD_FDS, fds):
+        os.dup2(new_fd, fd)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, saved_fd in zip(client.STANDARD_FDS, saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
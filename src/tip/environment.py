@@ -1,8 +1,13 @@
 import os
 import json
+import warnings
 
-from tip import config
-from tip.util import parse_package_specifier
+from tip import config, view
+from tip.util import parse_package_specifier, read_cached
+
+
+# Packages of loaded environments by their paths, kept only when enabled by `Environment.keep_in_memory`.
+_loaded_packages: dict | None = None
 
 
 class Environment:
@@ -18,18 +23,49 @@ class Environment:
         assert (path is None) != (name is None), "Load requires only one of `path` or `name`"
         if path is None:
             path = Environment.locate(name)
-        with open(path, mode='r', encoding='utf8') as environment_file:
-            return Environment(path=path, packages=json.load(environment_file))
+        return Environment(path=path, packages=dict(read_cached(_loaded_packages, path, _read_packages)))
+
+    @staticmethod
+    def keep_in_memory():
+        """Keep loaded environments in memory and reread them only after they change, for long-running processes."""
+        global _loaded_packages
+        if _loaded_packages is None:
+            _loaded_packages = {}
 
     @staticmethod
     def locate(name):
         """Find the path to the environment with the given `name`."""
         return os.path.join(config.ENVIRONMENTS_DIR, f'{name}.json')
 
+    @property
+    def name(self) -> str | None:
+        """Name of the environment if it's located in the environments directory, otherwise None."""
+        directory, file_name = os.path.split(os.path.abspath(self._path))
+        if directory != os.path.abspath(config.ENVIRONMENTS_DIR) or not file_name.endswith('.json'):
+            return None
+        return file_name.removesuffix('.json')
+
+    @staticmethod
+    def names():
+        """List names of all environments in the environments directory."""
+        try:
+            file_names = os.listdir(config.ENVIRONMENTS_DIR)
+        except FileNotFoundError:
+            return []
+        return sorted(name.removesuffix('.json') for name in file_names if name.endswith('.json'))
+
     def save(self):
-        """Save the environment to disk."""
+        """Save the environment to disk and rebuild its view if it's materialized."""
         with open(self._path, mode='w+', encoding='utf8') as environment_file:
             json.dump(self.packages, environment_file)
+        name = self.name
+        if name is None or not view.exists(name):
+            return
+        try:
+            view.build(name, self.packages)
+        except RuntimeError as ex:
+            view.remove(name)
+            warnings.warn(f"View of environment {name!r} is removed: {ex}")
 
     def add_package(self, package_specifier):
         """Add a package to the environment."""
@@ -42,3 +78,8 @@ class Environment:
         if self.packages.get(name) != version:
             raise ValueError(f"Package {package_specifier!r}' is not installed")
         self.packages.pop(name)
+
+
+def _read_packages(path: str) -> dict:
+    with open(path, mode='r', encoding='utf8') as environment_file:
+        return json.load(environment_file)
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import importlib
+import py_compile
+from concurrent.futures import ThreadPoolExecutor
+
+from tip import cache, packages
+from tip.tip_meta_finder import TipMetaFinder
+from tip.util import parse_package_specifier
+
+
+_READ_CHUNK_SIZE = 1 << 20
+
+
+def collect(finder: TipMetaFinder) -> list[dict]:
+    """
+    Collect modules imported through `finder` in the order they were imported.
+
+    Besides top-level modules resolved by the finder itself it includes their submodules, which are found by standard
+    path finders. Packages are stored by specifiers and file paths relative to the package directory, so the trace
+    stays valid when the package is served from the cache or site-packages directory is moved, e.g. on another node.
+    """
+    roots = {}
+    for fullname, package_dir, entry in finder.resolved:
+        roots.setdefault(fullname, (package_dir, entry))
+    trace = []
+    for name, module in list(sys.modules.items()):
+        top_level_name = name.partition('.')[0]
+        if top_level_name not in roots:
+            continue
+        filename = getattr(module, '__file__', None)
+        if filename is None:
+            continue
+        package_dir, entry = roots[top_level_name]
+        package_specifier = None
+        if package_dir is not None:
+            filename = os.path.relpath(filename, entry)
+            versions_dir, package_version = os.path.split(package_dir)
+            package_specifier = packages.make_package_specifier(os.path.basename(versions_dir), package_version)
+        trace.append({'name': name, 'package': package_specifier, 'file': filename})
+    return trace
+
+
+def save(trace: list[dict], path: str):
+    """Save `trace` to `path`."""
+    with open(path, mode='w', encoding='utf8') as trace_file:
+        json.dump({'modules': trace}, trace_file, indent=2)
+
+
+def load(path: str) -> list[dict]:
+    """Load trace from `path`."""
+    with open(path, mode='r', encoding='utf8') as trace_file:
+        return json.load(trace_file)['modules']
+
+
+def warm(trace: list[dict], *, jobs: int = 8, compile_modules: bool = True) -> list[str]:
+    """
+    Make modules from `trace` fast to import: cache their packages, read their files and compile them.
+
+    Packages are copied into the cache (when it's enabled), files are read in parallel to bring them into the page
+    cache, and modules are compiled so their bytecode doesn't have to be produced on import. Returns paths of the
+    traced files which were not found.
+    """
+    package_specifiers = {entry['package'] for entry in trace if entry['package'] is not None}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        roots = dict(zip(package_specifiers, executor.map(_get_package_root, package_specifiers)))
+        paths = [_resolve(entry, roots) for entry in trace]
+        found = list(executor.map(_read, paths))
+        if compile_modules:
+            list(executor.map(_compile, [path for path, exists in zip(paths, found) if exists]))
+    return [path for path, exists in zip(paths, found) if not exists]
+
+
+def preload(trace: list[dict]):
+    """Import modules from `trace` in the recorded order, skipping the ones that fail to import."""
+    for entry in trace:
+        try:
+            importlib.import_module(entry['name'])
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+def _get_package_root(package_specifier: str) -> str:
+    package_dir = packages.locate(*parse_package_specifier(package_specifier))
+    try:
+        return cache.get(package_dir)
+    except OSError:
+        return package_dir
+
+
+def _resolve(entry: dict, roots: dict[str, str]) -> str:
+    if entry['package'] is None:
+        return entry['file']
+    return os.path.join(roots[entry['package']], entry['file'])
+
+
+def _read(path: str) -> bool:
+    try:
+        with open(path, mode='rb') as f:
+            while f.read(_READ_CHUNK_SIZE):
+                pass
+    except OSError:
+        return False
+    return True
+
+
+def _compile(path: str):
+    if not path.endswith('.py'):
+        return
+    try:
+        py_compile.compile(path, doraise=True)
+    except (py_compile.PyCompileError, OSError):
+        pass  # The module is compiled on import as usual
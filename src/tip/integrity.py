@@ -0,0 +1,130 @@
+import os
+import csv
+import base64
+import shutil
+import hashlib
+import secrets
+import zipfile
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from tip import builds, cache, packages
+from tip.util import parse_package_specifier
+
+
+_READ_CHUNK_SIZE = 1 << 20
+
+
+def verify(package_specifiers: list[str], *, jobs: int = 8) -> dict[str, list[dict]]:
+    """
+    Check files of the installed packages against hashes and sizes listed in their `RECORD` files.
+
+    Files are hashed by `jobs` threads. Returns problems of the damaged packages by their specifiers: each problem has
+    'path' relative to the package directory and 'problem', one of 'missing', 'unreadable', 'size', 'hash' or
+    'no-record'.
+    """
+    problems: dict[str, list[dict]] = {}
+    checks = []
+    for package_specifier in package_specifiers:
+        package_dir = packages.locate(*parse_package_specifier(package_specifier))
+        records = _read_records(package_dir)
+        if len(records) == 0:
+            problems[package_specifier] = [{'path': '', 'problem': 'no-record'}]
+        for path, (expected_hash, expected_size) in records.items():
+            checks.append((package_specifier, package_dir, path, expected_hash, expected_size))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda check: _check_file(*check[1:]), checks)
+        for (package_specifier, _, path, _, _), problem in zip(checks, results):
+            if problem is not None:
+                problems.setdefault(package_specifier, []).append({'path': path, 'problem': problem})
+    return problems
+
+
+def repair(package_specifier: str, problems: list[dict], temp_dir: str) -> list[str]:
+    """
+    Restore damaged files of the package from its wheel and refresh its cache.
+
+    The wheel is taken from the build cache or downloaded again. Restored files are checked against `RECORD` before
+    they replace damaged ones. Returns paths which couldn't be restored.
+    """
+    package_name, package_version = parse_package_specifier(package_specifier)
+    package_dir = packages.locate(package_name, package_version)
+    records = _read_records(package_dir)
+    if any(problem['problem'] == 'no-record' for problem in problems):
+        return [problem['path'] for problem in problems]
+    wheel_path = builds.find(package_name, package_version) or packages._download(package_specifier, temp_dir)
+    unrepaired_paths = []
+    with zipfile.ZipFile(wheel_path) as wheel:
+        wheel_names = set(wheel.namelist())
+        for problem in problems:
+            path = problem['path']
+            if path not in wheel_names:
+                unrepaired_paths.append(path)
+                continue
+            data = wheel.read(path)
+            expected_hash, expected_size = records[path]
+            algorithm, _ = expected_hash.split('=', 1)
+            is_size_correct = expected_size is None or len(data) == expected_size
+            if not is_size_correct or _hash(data, algorithm) != expected_hash:
+                unrepaired_paths.append(path)
+                continue
+            _write_file(os.path.join(package_dir, *path.split('/')), data)
+    cache.clear(package_dir)
+    if cache.is_enabled():
+        cache.get(package_dir)
+    return unrepaired_paths
+
+
+def _read_records(package_dir: str) -> dict[str, tuple[str, int | None]]:
+    """Read hashes and sizes of files inside `package_dir` from `RECORD` files of its distributions."""
+    records = {}
+    for entry in os.listdir(package_dir):
+        record_path = os.path.join(package_dir, entry, 'RECORD')
+        if not entry.endswith('.dist-info') or not os.path.isfile(record_path):
+            continue
+        with open(record_path, mode='r', encoding='utf8', newline='') as record_file:
+            for row in csv.reader(record_file):
+                if len(row) < 3 or not row[1]:
+                    continue  # RECORD itself and compiled files have no hashes
+                path = posixpath.normpath(row[0])
+                if posixpath.isabs(path) or path.split('/')[0] == '..':
+                    continue  # Scripts and data files installed outside of the package directory
+                records[path] = (row[1], int(row[2]) if row[2] else None)
+    return records
+
+
+def _check_file(package_dir: str, path: str, expected_hash: str, expected_size: int | None) -> str | None:
+    file_path = os.path.join(package_dir, *path.split('/'))
+    try:
+        if expected_size is not None and os.path.getsize(file_path) != expected_size:
+            return 'size'
+        algorithm, _ = expected_hash.split('=', 1)
+        file_hash = hashlib.new(algorithm)
+        with open(file_path, mode='rb') as f:
+            while chunk := f.read(_READ_CHUNK_SIZE):
+                file_hash.update(chunk)
+    except FileNotFoundError:
+        return 'missing'
+    except OSError:
+        return 'unreadable'
+    if _encode_digest(algorithm, file_hash.digest()) != expected_hash:
+        return 'hash'
+    return None
+
+
+def _hash(data: bytes, algorithm: str) -> str:
+    return _encode_digest(algorithm, hashlib.new(algorithm, data).digest())
+
+
+def _encode_digest(algorithm: str, digest: bytes) -> str:
+    return f"{algorithm}={base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')}"
+
+
+def _write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{secrets.token_hex(8)}~"
+    with open(temp_path, mode='wb') as f:
+        f.write(data)
+    if os.path.exists(path):
+        shutil.copymode(path, temp_path)
+    os.replace(temp_path, path)
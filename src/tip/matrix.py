@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import fnmatch
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from tip import cache, config, packages
+from tip.environment import Environment
+
+
+def select_environments(pattern: str) -> list[str]:
+    """Find names of environments matching shell-style `pattern`."""
+    return [name for name in Environment.names() if fnmatch.fnmatchcase(name, pattern)]
+
+
+def warm_up(environment_names: list[str], *, jobs: int = 8) -> tuple[list[str], dict[str, BaseException]]:
+    """
+    Prepare environments to be run by many processes: populate the cache with their packages once.
+
+    Returns specifiers of packages which are not installed, environments which need them can't be run, and errors of
+    packages which failed to be cached by their directories, runs read those packages from site-packages.
+    """
+    package_dirs = set()
+    missing_package_specifiers = []
+    for name in environment_names:
+        env = Environment.load(name=name)
+        for package_name, package_version in env.packages.items():
+            package_dir = packages.locate(package_name, package_version)
+            if os.path.isdir(package_dir):
+                package_dirs.add(package_dir)
+            else:
+                missing_package_specifiers.append(packages.make_package_specifier(package_name, package_version))
+    errors = cache.prefetch(sorted(package_dirs), jobs=jobs) if cache.is_enabled() else {}
+    return sorted(set(missing_package_specifiers)), errors
+
+
+def run(environment_names: list[str], args: tuple[str, ...], *, jobs: int, on_done=None) -> list[dict]:
+    """
+    Run `tip run <args>` in each environment, at most `jobs` processes at once.
+
+    Returns results in order of `environment_names`: environment name, exit code, duration in seconds and captured
+    stdout and stderr. `on_done(result)` is called as soon as each run finishes.
+    """
+    child_environ = {**os.environ, 'TIP_DIR': os.path.abspath(config.TIP_DIR)}  # Located by `python -m tip`
+
+    def run_environment(name):
+        command = [sys.executable, '-m', 'tip', 'run', '-e', Environment.locate(name), *args]
+        start = time.perf_counter()
+        completed_process = subprocess.run(command, env=child_environ, capture_output=True, text=True, check=False)
+        result = {
+            'environment': name,
+            'exit_code': completed_process.returncode,
+            'duration': time.perf_counter() - start,
+            'stdout': completed_process.stdout,
+            'stderr': completed_process.stderr,
+        }
+        if on_done is not None:
+            on_done(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(run_environment, environment_names))
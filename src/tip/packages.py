@@ -5,8 +5,18 @@ import tempfile
 import subprocess
 from collections import deque
 
-from tip import cache, config
-from tip.util import parse_package_specifier
+from packaging.requirements import Requirement
+from packaging.specifiers import SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import Version
+
+from tip import builds, cache, config, telemetry
+from tip.util import parse_package_specifier, read_cached
+
+
+# Installed versions and dependencies of packages by paths they are read from, kept only when enabled by
+# `keep_in_memory`.
+_installed_state: dict | None = None
 
 
 def is_valid(package_specifier: str) -> bool:
@@ -23,32 +33,83 @@ def make_package_specifier(package_name: str, package_version: str) -> str:
     return f"{package_name}=={package_version}"
 
 
-def install(package_specifiers: list[str]):
-    """Install packages identified by `package_specifiers`."""
+def install(package_specifiers: list[str], *, reuse_installed: bool = False) -> dict[str, int]:
+    """
+    Install packages identified by `package_specifiers`.
+
+    If `reuse_installed` is set, dependencies are resolved to installed versions whenever they satisfy requirements of
+    the packages. Returns number of downloads avoided this way and total size of the reused packages.
+    """
     queue = deque(package_specifiers)
-    with tempfile.TemporaryDirectory() as temp_dir:
+    savings = {'downloads': 0, 'bytes': 0}
+    with telemetry.run(), tempfile.TemporaryDirectory() as temp_dir:
         while len(queue) > 0:
             package_specifier = queue.popleft()
             if not is_valid(package_specifier):
                 raise RuntimeError(f"Invalid package specifier: {package_specifier!r}")
             if is_installed(package_specifier):
                 continue
-            download_output = subprocess.check_output(
-                f"pip download --no-deps {package_specifier}",
-                shell=True,
-                cwd=temp_dir
-            )
-            wheel_path = os.path.join(temp_dir, download_output.decode('utf8').split('\n')[-3].replace('Saved ', ''))
-            dry_run_report_path = os.path.join(temp_dir, 'dry-run-report.json')
-            subprocess.run(f"pip install --dry-run {wheel_path} --report {dry_run_report_path}", shell=True, check=True)
-            dependencies = []
-            with open(dry_run_report_path) as report_file:
-                dry_run_report = json.load(report_file)
+            wheel_path = builds.find(*parse_package_specifier(package_specifier))
+            if wheel_path is None:
+                wheel_path = _download(package_specifier, temp_dir)
+            with telemetry.span('resolve', package_specifier):
+                dry_run_report = _resolve(wheel_path, temp_dir)
+                if reuse_installed:
+                    dry_run_report = _reuse_installed(package_specifier, wheel_path, dry_run_report, temp_dir, savings)
+                dependencies = []
                 for package in dry_run_report['install']:
                     package_metadata = package['metadata']
                     dependencies.append(f"{package_metadata['name']}=={package_metadata['version']}")
             _install(package_specifier, wheel_path=wheel_path, dependencies=dependencies)
             queue.extend(dependencies)
+    return savings
+
+
+def installed_versions(package_name: str) -> list[str]:
+    """List installed versions of the package, its name is compared in normalized form."""
+    site_packages_dir = config.get('site_packages_dir')
+    try:
+        installed_names = os.listdir(site_packages_dir)
+    except FileNotFoundError:
+        return []
+    canonical_name = canonicalize_name(package_name)
+    versions = []
+    for installed_name in installed_names:
+        if canonicalize_name(installed_name) == canonical_name:
+            versions.extend(os.listdir(os.path.join(site_packages_dir, installed_name)))
+    return versions
+
+
+def list_installed() -> list[str]:
+    """List specifiers of all installed packages."""
+    site_packages_dir = config.get('site_packages_dir')
+    try:
+        package_names = os.listdir(site_packages_dir)
+    except FileNotFoundError:
+        return []
+    package_specifiers = []
+    for package_name in sorted(package_names):
+        for package_version in sorted(os.listdir(os.path.join(site_packages_dir, package_name))):
+            if not package_version.endswith('~'):  # Packages being unpacked
+                package_specifiers.append(make_package_specifier(package_name, package_version))
+    return package_specifiers
+
+
+def closure(package_specifiers: list[str]) -> list[str]:
+    """
+    Find packages identified by `package_specifiers` and all their dependencies, recursively.
+
+    Raises `RuntimeError` if any of the packages is not installed.
+    """
+    installed_package_specifiers, missing_package_specifiers = _walk_dependencies(package_specifiers)
+    if len(missing_package_specifiers) > 0:
+        raise RuntimeError(f"Package {missing_package_specifiers[0]!r} is not installed or corrupted")
+    return installed_package_specifiers
+
+
+def find_missing(package_specifiers: list[str]) -> list[str]:
+    """Find packages which are needed by packages identified by `package_specifiers`, but are not installed."""
+    return _walk_dependencies(package_specifiers)[1]
 
 
 def make_link(package_specifier: str):
@@ -66,7 +127,20 @@ def make_link(package_specifier: str):
 def is_installed(package_specifier: str) -> bool:
     """Check if package identified by `package_specifier` is installed."""
     package_dir = locate(*parse_package_specifier(package_specifier))
-    return os.path.isdir(package_dir)
+    if _installed_state is None:
+        return os.path.isdir(package_dir)
+    versions_dir, version = os.path.split(package_dir)
+    try:
+        return version in read_cached(_installed_state, versions_dir, lambda path: frozenset(os.listdir(path)))
+    except FileNotFoundError:
+        return False
+
+
+def keep_in_memory():
+    """Keep installed versions and dependencies of packages in memory, reread them only after they change."""
+    global _installed_state
+    if _installed_state is None:
+        _installed_state = {}
 
 
 def locate(package_name: str, package_version: str) -> str:
@@ -95,12 +169,125 @@ def _install(package_specifier: str, /, *, wheel_path: str = None, dependencies=
         return
     os.makedirs(package_dir)
     command = f"pip install --target={package_dir} --no-deps {wheel_path or package_specifier}"
+    package_size = 0
+    with telemetry.span('extract', package_specifier) as span:
+        try:
+            subprocess.run(command, shell=True, check=True)
+        except Exception as ex:
+            shutil.rmtree(package_dir)
+            raise RuntimeError(f"Error while installing package {package_specifier!r}") from ex
+        with open(os.path.join(package_dir, "dependencies.json"), mode='w') as dependencies_file:
+            json.dump(dependencies or {}, dependencies_file)
+        if telemetry.is_enabled():
+            package_size = span['bytes_written'] = telemetry.directory_size(package_dir)
+    with telemetry.span('cache-populate', package_specifier) as span:
+        cache.get(package_dir)  # Invalidate cache
+        if cache.is_enabled():
+            span['bytes_written'] = package_size
+    with telemetry.span('link', package_specifier):
+        make_link(package_specifier)
+
+
+def _walk_dependencies(package_specifiers: list[str]) -> tuple[list[str], list[str]]:
+    """Find installed and missing packages among `package_specifiers` and all their dependencies, recursively."""
+    queue = deque(package_specifiers)
+    seen = set(package_specifiers)
+    installed_package_specifiers = []
+    missing_package_specifiers = []
+    while len(queue) > 0:
+        package_specifier = queue.popleft()
+        package_dir = locate(*parse_package_specifier(package_specifier))
+        try:
+            dependencies = read_cached(_installed_state, os.path.join(package_dir, "dependencies.json"), _read_json)
+        except FileNotFoundError:
+            missing_package_specifiers.append(package_specifier)
+            continue
+        installed_package_specifiers.append(package_specifier)
+        for dependency in dependencies:
+            if dependency not in seen:
+                seen.add(dependency)
+                queue.append(dependency)
+    return installed_package_specifiers, missing_package_specifiers
+
+
+def _download(package_specifier: str, temp_dir: str) -> str:
+    """Download wheel of the package into `temp_dir`, build it and put into the build cache if only sdist is found."""
+    with telemetry.span('download', package_specifier) as span:
+        download_output = subprocess.check_output(
+            f"pip download --no-deps {package_specifier}",
+            shell=True,
+            cwd=temp_dir
+        )
+        distribution_path = os.path.join(temp_dir, download_output.decode('utf8').split('\n')[-3].replace('Saved ', ''))
+        span['bytes_transferred'] = os.path.getsize(distribution_path)
+    if not builds.is_sdist(distribution_path):
+        return distribution_path
+    with telemetry.span('build', package_specifier) as span:
+        wheel_path = builds.build(distribution_path, *parse_package_specifier(package_specifier), temp_dir)
+        span['bytes_written'] = os.path.getsize(wheel_path)
+    return wheel_path
+
+
+def _resolve(wheel_path: str, temp_dir: str, constraints_path: str | None = None) -> dict:
+    """Resolve dependencies of the wheel with pip and return its installation report."""
+    dry_run_report_path = os.path.join(temp_dir, 'dry-run-report.json')
+    constraints_option = f"--constraint {constraints_path}" if constraints_path is not None else ""
+    subprocess.run(
+        f"pip install --dry-run {wheel_path} {constraints_option} --report {dry_run_report_path}",
+        shell=True,
+        check=True
+    )
+    with open(dry_run_report_path) as report_file:
+        return json.load(report_file)
+
+
+def _reuse_installed(package_specifier: str, wheel_path: str, dry_run_report: dict, temp_dir: str, savings: dict):
+    """
+    Resolve dependencies again, constraining them to installed versions which satisfy all the requirements.
+
+    The constrained resolution is checked by pip, if it fails the original `dry_run_report` is returned.
+    """
+    package_name, _ = parse_package_specifier(package_specifier)
+    specifiers = _collect_specifiers(dry_run_report)
+    pins = {}
+    for package in dry_run_report['install']:
+        name, version = package['metadata']['name'], package['metadata']['version']
+        if canonicalize_name(name) == canonicalize_name(package_name) or is_installed(f"{name}=={version}"):
+            continue
+        specifier = specifiers.get(canonicalize_name(name), SpecifierSet())
+        candidates = [Version(v) for v in installed_versions(name) if specifier.contains(v, prereleases=True)]
+        if len(candidates) > 0:
+            pins[name] = str(max(candidates))
+    if len(pins) == 0:
+        return dry_run_report
+    constraints_path = os.path.join(temp_dir, 'constraints.txt')
+    with open(constraints_path, mode='w', encoding='utf8') as constraints_file:
+        constraints_file.writelines(f"{name}=={version}\n" for name, version in pins.items())
     try:
-        subprocess.run(command, shell=True, check=True)
-    except Exception as ex:
-        shutil.rmtree(package_dir)
-        raise RuntimeError(f"Error while installing package {package_specifier!r}") from ex
-    with open(os.path.join(package_dir, "dependencies.json"), mode='w') as dependencies_file:
-        json.dump(dependencies or {}, dependencies_file)
-    cache.get(package_dir)  # Invalidate cache
-    make_link(package_specifier)
+        constrained_report = _resolve(wheel_path, temp_dir, constraints_path)
+    except subprocess.CalledProcessError:
+        return dry_run_report
+    for package in constrained_report['install']:
+        name, version = package['metadata']['name'], package['metadata']['version']
+        if name in pins and is_installed(f"{name}=={version}"):
+            savings['downloads'] += 1
+            savings['bytes'] += telemetry.directory_size(locate(name, version))
+    return constrained_report
+
+
+def _collect_specifiers(dry_run_report: dict) -> dict[str, SpecifierSet]:
+    """Combine version requirements of all packages from the report, by normalized names of the required packages."""
+    specifiers: dict[str, SpecifierSet] = {}
+    for package in dry_run_report['install']:
+        for requirement_string in package['metadata'].get('requires_dist', []):
+            requirement = Requirement(requirement_string)
+            if requirement.marker is not None and not requirement.marker.evaluate({'extra': ''}):
+                continue
+            name = canonicalize_name(requirement.name)
+            specifiers[name] = specifiers.get(name, SpecifierSet()) & requirement.specifier
+    return specifiers
+
+
+def _read_json(path: str):
+    with open(path, mode='r', encoding='utf8') as f:
+        return json.load(f)
@@ -8,7 +8,8 @@ from typing import Any, no_type_check
 
 import click
 
-from tip import packages
+from tip import cache, import_trace, packages, view
+from tip import watch as watch_
 from tip.environment import Environment
 from tip.tip_meta_finder import TipMetaFinder
 
@@ -18,24 +19,67 @@ def run(
     command: str,
     env: Environment | None,
     install_missing: bool,
-    args: tuple[str]
+    args: tuple[str],
+    *,
+    record_imports_path: str | None = None,
+    replay_imports_path: str | None = None,
+    preload: bool = False,
+    use_view: bool = True,
+    watch: bool = False
 ):
-    """Run given module, command or file using environment at `environment_path`."""
+    """
+    Run given module, command or file using environment at `environment_path`.
+
+    If `record_imports_path` is given, modules imported from the environment are saved there as an import trace. If
+    `replay_imports_path` is given, modules from that trace are warmed up before running and, if `preload` is set,
+    imported in advance.
+
+    If the environment is materialized and `use_view` is set, its view is put on `sys.path` instead of installing
+    `TipMetaFinder`, unless imports are recorded. With the cache enabled, all packages of the environment are cached
+    before the run, the finder is used if some of them can't be cached.
+
+    If `watch` is set, the module or the file is run again each time modules it imported from the working directory
+    change, reloading only the affected modules.
+    """
     is_module_name_given = isinstance(module_name, str) and len(module_name) > 0
     is_command_given = isinstance(command, str) and len(command) > 0
     is_python_file_path_given = not (is_module_name_given or is_command_given) and len(args) > 0
-    if is_python_file_path_given:
-        python_file_path = args[0]
+    python_file_path = args[0] if is_python_file_path_given else None
+    if watch and not (is_python_file_path_given or is_module_name_given):
+        raise RuntimeError("Only a module or a file can be run in watch mode")
     if install_missing:
         if env is None:
             raise RuntimeError("Can't install missing packages because environment is not provided")
         package_specifiers = [packages.make_package_specifier(name, version) for name, version in env.packages.items()]
         packages.install(package_specifiers)
-    packages_to_folders = _map_packages_to_folders(env)
-    finder = TipMetaFinder(packages_to_folders)
-    sys.meta_path.insert(0, finder)
+    view_path = _locate_view(env) if use_view and record_imports_path is None else None
+    if view_path is not None:
+        finder = None
+        sys.path[0:0] = [view_path, os.getcwd()]
+    else:
+        packages_to_folders = _map_packages_to_folders(env)
+        finder = TipMetaFinder(packages_to_folders)
+        sys.meta_path.insert(0, finder)
     _remove_external_imports()
-    if is_python_file_path_given:
+    if replay_imports_path is not None:
+        trace = import_trace.load(replay_imports_path)
+        import_trace.warm(trace)
+        if preload:
+            import_trace.preload(trace)
+    try:
+        if watch:
+            watch_.watch(lambda: _run(python_file_path, module_name, command, args))
+        else:
+            _run(python_file_path, module_name, command, args)
+    finally:
+        if finder is not None and record_imports_path is not None:
+            import_trace.save(import_trace.collect(finder), record_imports_path)
+
+
+def _run(python_file_path: str | None, module_name: str, command: str, args: tuple[str]):
+    is_module_name_given = isinstance(module_name, str) and len(module_name) > 0
+    is_command_given = isinstance(command, str) and len(command) > 0
+    if python_file_path is not None:
         _run_file(python_file_path, args)
     elif is_module_name_given:
         _run_module(module_name, args)
@@ -90,6 +134,17 @@ def _disable_pycache():
         sys.dont_write_bytecode = old_dont_write_bytecode
 
 
+def _locate_view(env: Environment | None) -> str | None:
+    if env is None or env.name is None or not view.exists(env.name):
+        return None
+    if cache.is_enabled():
+        # The view links to cached copies of the packages, which may be missing in the cache of this node
+        package_dirs = [packages.locate(name, version) for name, version in env.packages.items()]
+        if len(cache.prefetch(package_dirs)) > 0:
+            return None
+    return view.locate(env.name)
+
+
 def _map_packages_to_folders(env: Environment | None) -> dict[str, str]:
     packages_to_folders: dict[str, str] = {}
     if env is None:
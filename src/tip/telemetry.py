@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import secrets
+import contextlib
+from collections import defaultdict
+
+from tip import config
+
+
+TELEMETRY_PATH = config.get('telemetry_path')
+TELEMETRY_FORMAT = config.get('telemetry_format') or 'jsonl'
+FORMATS = ('jsonl', 'openmetrics')
+RUN_ID = secrets.token_hex(8)  # Replaced by `run` for each group of spans, e.g. each install
+
+_run_spans: list[dict] = []
+
+
+@contextlib.contextmanager
+def run():
+    """Record spans inside the context as a new run, with its own `RUN_ID` and its own OpenMetrics file contents."""
+    global RUN_ID
+    RUN_ID = secrets.token_hex(8)
+    _run_spans.clear()
+    yield
+
+
+@contextlib.contextmanager
+def span(stage: str, package_specifier: str | None = None):
+    """
+    Measure duration of install `stage` of the package identified by `package_specifier`.
+
+    Yields the span record, callers may set its `bytes_transferred` and `bytes_written`. The record is written to
+    `telemetry_path` from config in `telemetry_format` ('jsonl' or 'openmetrics'). Does nothing when it's not set.
+    """
+    record = {
+        'run_id': RUN_ID,
+        'stage': stage,
+        'package': package_specifier,
+        'start': time.time(),
+        'duration': 0.0,
+        'bytes_transferred': 0,
+        'bytes_written': 0,
+        'ok': False,
+    }
+    start = time.perf_counter()
+    try:
+        yield record
+        record['ok'] = True
+    finally:
+        record['duration'] = time.perf_counter() - start
+        if is_enabled():
+            _write(record)
+
+
+def is_enabled():
+    """Check if telemetry is enabled."""
+    return TELEMETRY_PATH is not None
+
+
+def load(path: str | None = None) -> list[dict]:
+    """Load spans from JSONL telemetry file at `path` or at `telemetry_path` from config."""
+    path = path or TELEMETRY_PATH
+    if path is None:
+        raise RuntimeError("Telemetry is disabled, set 'telemetry_path' in config to enable it")
+    spans = []
+    with open(path, mode='r', encoding='utf8') as telemetry_file:
+        for line in telemetry_file:
+            try:
+                spans.append(json.loads(line))
+            except json.decoder.JSONDecodeError:
+                pass  # Truncated by interrupted write
+    return spans
+
+
+def summarize(spans: list[dict], *, last_runs: int | None = None) -> dict[str, dict[str, dict]]:
+    """
+    Aggregate `spans` of `last_runs` most recent runs by package and by stage.
+
+    Returns dict with keys 'packages' and 'stages', each maps a package or a stage to its total duration, bytes
+    transferred, bytes written and count of spans.
+    """
+    run_ids = list(dict.fromkeys(record['run_id'] for record in spans))
+    if last_runs is not None:
+        run_ids = run_ids[-last_runs:]
+    selected_run_ids = set(run_ids)
+    summary: dict[str, dict[str, dict]] = {'packages': defaultdict(_make_totals), 'stages': defaultdict(_make_totals)}
+    for record in spans:
+        if record['run_id'] not in selected_run_ids:
+            continue
+        for key, group in (('package', 'packages'), ('stage', 'stages')):
+            if record[key] is None:
+                continue
+            totals = summary[group][record[key]]
+            totals['duration'] += record['duration']
+            totals['bytes_transferred'] += record['bytes_transferred']
+            totals['bytes_written'] += record['bytes_written']
+            totals['count'] += 1
+    return {group: dict(totals) for group, totals in summary.items()}
+
+
+def directory_size(path: str) -> int:
+    """Compute total size of files in the directory at `path`."""
+    size = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def _make_totals():
+    return {'duration': 0.0, 'bytes_transferred': 0, 'bytes_written': 0, 'count': 0}
+
+
+def _write(record: dict):
+    if TELEMETRY_FORMAT not in FORMATS:
+        raise RuntimeError(f"Unknown telemetry format {TELEMETRY_FORMAT!r}, must be one of {FORMATS}")
+    os.makedirs(os.path.dirname(os.path.abspath(TELEMETRY_PATH)), exist_ok=True)
+    if TELEMETRY_FORMAT == 'jsonl':
+        with open(TELEMETRY_PATH, mode='a', encoding='utf8') as telemetry_file:
+            telemetry_file.write(json.dumps(record) + '\n')
+        return
+    _run_spans.append(record)
+    temp_path = f"{TELEMETRY_PATH}.{RUN_ID}~"
+    with open(temp_path, mode='w', encoding='utf8') as telemetry_file:
+        telemetry_file.write(_format_openmetrics(_run_spans))
+    os.replace(temp_path, TELEMETRY_PATH)
+
+
+def _format_openmetrics(spans: list[dict]) -> str:
+    """Format spans of the current run as OpenMetrics text, suitable for textfile collectors."""
+    metrics = [
+        ('tip_install_stage_duration_seconds', 'seconds', 'duration', "Duration of an install stage"),
+        ('tip_install_stage_transferred_bytes', 'bytes', 'bytes_transferred', "Bytes downloaded by an install stage"),
+        ('tip_install_stage_written_bytes', 'bytes', 'bytes_written', "Bytes written by an install stage"),
+        ('tip_install_stage_start_timestamp_seconds', 'seconds', 'start', "Unix time an install stage started at"),
+    ]
+    lines = []
+    for metric_name, unit, key, help_text in metrics:
+        lines.append(f"# TYPE {metric_name} gauge")
+        lines.append(f"# UNIT {metric_name} {unit}")
+        lines.append(f"# HELP {metric_name} {help_text}.")
+        for record in spans:
+            labels = f'stage="{_escape(record["stage"])}",package="{_escape(record["package"] or "")}"'
+            # No sample timestamps, textfile collectors reject them
+            lines.append(f"{metric_name}{{{labels}}} {record[key]}")
+    lines.append("# EOF")
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
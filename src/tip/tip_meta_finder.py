@@ -10,6 +10,8 @@ class TipMetaFinder(MetaPathFinder):
 
     def __init__(self, packages_to_mount):
         self.packages_to_mount = packages_to_mount
+        # (fullname, package dir or None, directory the module was found in) for each resolved import, in order.
+        self.resolved: list[tuple[str, str | None, str]] = []
         if cache.is_enabled():
             self.packages_to_mount_cache = {}
 
@@ -32,5 +34,6 @@ class TipMetaFinder(MetaPathFinder):
                 submodule_locations = None
             if not os.path.exists(filename):
                 continue
+            self.resolved.append((fullname, self.packages_to_mount.get(fullname), entry))
             return spec_from_file_location(fullname, filename, submodule_search_locations=submodule_locations)
         return None
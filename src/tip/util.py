@@ -1,3 +1,7 @@
+import os
+from typing import Any, Callable
+
+
 def parse_package_specifier(package_specifier: str) -> tuple[str, str]:
     """Parse package specifier into package name and package version."""
     try:
@@ -5,3 +9,19 @@ def parse_package_specifier(package_specifier: str) -> tuple[str, str]:
     except ValueError as ex:
         raise ValueError("Package specifier must be '<package_name>==<package_version>'") from ex
     return name, version
+
+
+def read_cached(cache: dict | None, path: str, read: Callable[[str], Any]) -> Any:
+    """
+    Return `read(path)`, reusing the result stored in `cache` while the file or directory at `path` is unchanged.
+
+    Changes are detected by modification time and size of `path`. If `cache` is None, `path` is always read.
+    """
+    if cache is None:
+        return read(path)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = cache.get(path)
+    if cached is None or cached[0] != key:
+        cached = cache[path] = (key, read(path))
+    return cached[1]
@@ -0,0 +1,69 @@
+import os
+import shutil
+import secrets
+
+from tip import cache, config, packages
+
+
+# Entries every package may have, they are not importable and would always conflict.
+_SKIPPED_ENTRIES = {'dependencies.json', 'bin', '__pycache__'}
+
+
+def locate(environment_name: str) -> str:
+    """Locate the view of environment named `environment_name`."""
+    return os.path.join(config.VIEWS_DIR, environment_name)
+
+
+def exists(environment_name: str) -> bool:
+    """Check if environment named `environment_name` is materialized."""
+    return os.path.isdir(locate(environment_name))
+
+
+def build(environment_name: str, environment_packages: dict[str, str]) -> str:
+    """
+    Materialize environment: make a directory with links to the top-level entries of `environment_packages`.
+
+    With this directory on `sys.path` standard path finders import the environment packages without `TipMetaFinder`.
+    With the cache enabled, links point to the cached copies of the packages, so they must be cached on every node
+    before the view is used there. The view is replaced atomically, so running processes see either the old or the
+    new one. Raises `RuntimeError` if packages are not installed or provide the same top-level entries.
+    """
+    entries: dict[str, tuple[str, str]] = {}
+    for name, version in environment_packages.items():
+        package_specifier = packages.make_package_specifier(name, version)
+        package_dir = packages.locate(name, version)
+        if not os.path.isdir(package_dir):
+            raise RuntimeError(f"Package {package_specifier!r} is not installed")
+        linked_dir = cache.get(package_dir)
+        for entry in os.listdir(package_dir):
+            if entry in _SKIPPED_ENTRIES:
+                continue
+            if entry in entries:
+                other_package_specifier, _ = entries[entry]
+                raise RuntimeError(f"Packages {other_package_specifier!r} and {package_specifier!r} both provide "
+                                   f"{entry!r}, environment can't be materialized")
+            entries[entry] = (package_specifier, os.path.join(linked_dir, entry))
+    os.makedirs(config.VIEWS_DIR, exist_ok=True)
+    token = secrets.token_hex(8)
+    target_dir = os.path.join(config.VIEWS_DIR, f".{environment_name}-{token}")
+    os.mkdir(target_dir)
+    for entry, (_, entry_path) in entries.items():
+        os.symlink(entry_path, os.path.join(target_dir, entry))
+    view_path = locate(environment_name)
+    old_target_dir = os.path.realpath(view_path) if os.path.islink(view_path) else None
+    temp_link_path = os.path.join(config.VIEWS_DIR, f".{environment_name}-{token}~")
+    os.symlink(os.path.basename(target_dir), temp_link_path)  # Relative, so it works when VIEWS_DIR is relative
+    os.replace(temp_link_path, view_path)
+    if old_target_dir is not None:
+        shutil.rmtree(old_target_dir, ignore_errors=True)
+    return view_path
+
+
+def remove(environment_name: str):
+    """Remove the view of environment named `environment_name`."""
+    view_path = locate(environment_name)
+    if not os.path.islink(view_path):
+        return
+    target_dir = os.path.realpath(view_path)
+    os.unlink(view_path)
+    shutil.rmtree(target_dir, ignore_errors=True)
@@ -0,0 +1,157 @@
+import os
+import ast
+import sys
+import time
+import importlib
+import traceback
+from importlib.util import resolve_name
+from typing import Callable
+
+
+POLL_INTERVAL = 0.5
+
+
+def watch(run_entry_point: Callable[[], None]):
+    """
+    Run the entry point, then rerun it each time a module it imported from the working directory is changed.
+
+    The interpreter and modules of the environment stay loaded. Only changed modules and modules which import them,
+    directly or indirectly, are unloaded before the rerun, so they are imported again by the entry point.
+    """
+    # Modules which failed to import, even on the first run, are watched by their local files, so fixing them triggers
+    # a rerun. Files of missing modules are watched too, so creating them triggers a rerun. Modules stay watched after
+    # they are unloaded for a rerun.
+    watched_paths: dict[str, str] = {}  # Path -> module name
+    while True:
+        _run_once(run_entry_point)
+        local_modules = _find_local_modules()
+        watched_paths.update({path: name for name, path in local_modules.items()})
+        watched_paths.update(_find_unloaded_imports(local_modules))
+        changed_names = _wait_for_changes(watched_paths)
+        existing_modules = {name: path for path, name in watched_paths.items() if os.path.isfile(path)}
+        affected_names = _find_dependents(changed_names, existing_modules)
+        for name in affected_names:
+            sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        print(f"\n--- Rerunning after changes in {', '.join(sorted(changed_names))} ---\n", file=sys.stderr)
+
+
+def _run_once(run_entry_point: Callable[[], None]):
+    try:
+        run_entry_point()
+    except SystemExit:
+        pass
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+
+
+def _find_local_modules() -> dict[str, str]:
+    """Find modules imported from files in the working directory, including the entry point, return their paths."""
+    cwd = os.path.realpath(os.getcwd()) + os.sep
+    local_modules = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, '__file__', None)
+        if filename is None:
+            continue
+        if name != '__main__' and not os.path.realpath(filename).startswith(cwd):
+            continue
+        local_modules[name] = filename
+    return local_modules
+
+
+def _find_unloaded_imports(local_modules: dict[str, str]) -> dict[str, str]:
+    """
+    Find local files of modules which `local_modules` import but which are not loaded, e.g. failed to import.
+
+    Returns module names by paths. If a module has no file yet, all paths it would be imported from are returned.
+    """
+    cwd = os.path.realpath(os.getcwd())
+    search_dirs = [cwd]
+    for entry in sys.path:
+        search_dir = os.path.realpath(entry or os.curdir)
+        if search_dir not in search_dirs and search_dir.startswith(cwd + os.sep):
+            search_dirs.append(search_dir)
+    unloaded_modules = {}
+    for name, path in local_modules.items():
+        for imported_name in _find_imports(name, path) - sys.modules.keys():
+            if _is_in_external_package(imported_name, local_modules):
+                continue  # E.g. `from typing import Any` gives 'typing.Any', which is not a module
+            candidate_paths = _list_module_files(imported_name, search_dirs)
+            existing_paths = [candidate_path for candidate_path in candidate_paths if os.path.isfile(candidate_path)]
+            for candidate_path in existing_paths[:1] or candidate_paths:
+                unloaded_modules[candidate_path] = imported_name
+    return unloaded_modules
+
+
+def _is_in_external_package(name: str, local_modules: dict[str, str]) -> bool:
+    """Check if a package containing module `name` is loaded, but not from the working directory."""
+    parts = name.split('.')
+    for i in range(1, len(parts)):
+        package_name = '.'.join(parts[:i])
+        if package_name in sys.modules and package_name not in local_modules:
+            return True
+    return False
+
+
+def _list_module_files(name: str, search_dirs: list[str]) -> list[str]:
+    relative_path = os.path.join(*name.split('.'))
+    return [os.path.join(search_dir, candidate)
+            for search_dir in search_dirs
+            for candidate in (f"{relative_path}.py", os.path.join(relative_path, '__init__.py'))]
+
+
+def _wait_for_changes(watched_paths: dict[str, str]) -> set[str]:
+    """Wait until any of `watched_paths` is changed, created or removed, return names of the changed modules."""
+    mtimes = {path: _get_mtime(path) for path in watched_paths}
+    while True:
+        time.sleep(POLL_INTERVAL)
+        changed_names = {name for path, name in watched_paths.items() if _get_mtime(path) != mtimes[path]}
+        if len(changed_names) > 0:
+            return changed_names
+
+
+def _find_dependents(names: set[str], local_modules: dict[str, str]) -> set[str]:
+    """Find `names` and local modules which import any of them, directly or indirectly."""
+    importers: dict[str, set[str]] = {}
+    for name, path in local_modules.items():
+        for imported_name in _find_imports(name, path):
+            importers.setdefault(imported_name, set()).add(name)
+    dependents = set(names)
+    queue = list(names)
+    while len(queue) > 0:
+        name = queue.pop()
+        for importer in importers.get(name, set()):
+            if importer not in dependents:
+                dependents.add(importer)
+                queue.append(importer)
+    return dependents
+
+
+def _find_imports(name: str, path: str) -> set[str]:
+    """Find names of modules imported by module `name` from source at `path`, including possible submodules."""
+    try:
+        with open(path, mode='rb') as source_file:
+            tree = ast.parse(source_file.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    is_package = os.path.basename(path) == '__init__.py'
+    package = name if is_package else name.rpartition('.')[0]
+    imported_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported_names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            try:
+                module_name = resolve_name('.' * node.level + (node.module or ''), package)
+            except (ImportError, ValueError):
+                continue
+            imported_names.add(module_name)
+            imported_names.update(f"{module_name}.{alias.name}" for alias in node.names)
+    return imported_names
+
+
+def _get_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return -1